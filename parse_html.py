@@ -8,84 +8,186 @@ from pathlib import Path
 from html.parser import HTMLParser
 from urllib.parse import urlparse, urljoin
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 import zipfile
+import time
 import shutil
 
+# lxml 要設定 PARSE_HTML_LXML=1 才會使用。libxml2 修補標籤的規則和 HTMLParser 不同，
+# 抽出的正文會有出入，所以預設只用標準庫 HTMLParser，輸出不因環境裡有沒有 lxml 而改變
+if os.environ.get('PARSE_HTML_LXML') == '1':
+    from lxml import etree
+else:
+    etree = None
+
+try:
+    import orjson
+except ImportError:  # 沒有 orjson 時改用標準庫的 json
+    orjson = None
+
+# 預先編譯的正規表示式
+_META_PATTERNS = {
+    'og:url': re.compile(r'<meta\s+property=["\']og:url["\']\s+content=["\']([^"\']+)["\']', re.IGNORECASE),
+    'og:title': re.compile(r'<meta\s+property=["\']og:title["\']\s+content=["\']([^"\']+)["\']', re.IGNORECASE),
+    'canonical': re.compile(r'<link\s+rel=["\']canonical["\']\s+href=["\']([^"\']+)["\']', re.IGNORECASE)
+}
+_STUDENT_ID = re.compile(r'\b\d{8,10}\b')
+_EMAIL = re.compile(r'[\w.-]+@[\w.-]+\.\w+')
+_PHONE = re.compile(r'(?:\d{2,4}[-.\s]?)*\d{4}[-.\s]?\d{4}')
+# 學號和電話都要有數字；整段沒有數字就不必跑這兩個樣式
+_DIGIT = re.compile(r'\d')
+_LINK = re.compile(r'<a\s+(?:[^>]*?\s+)?href=["\']([^"\']+)["\'][^>]*>([^<]*)</a>', re.IGNORECASE)
+_TITLE = re.compile(r'<title>([^<]+)</title>', re.IGNORECASE)
+_PTT_BOARD = re.compile(r'看板\s+([^\s]+)')
+_AUTHOR_ANCHOR = re.compile(r'作者')
+_AUTHOR_LINK = re.compile(r'href[^>]*>([^<]+)</a>', re.IGNORECASE)
+# 作者連結只在「作者」之後這麼多字元內尋找
+_AUTHOR_WINDOW = 500
+_DCARD_BOARD = re.compile(r'板 _ Dcard')
+_PLATFORM_MARKER = re.compile(r'ptt|dcard', re.IGNORECASE)
+_PTT_MARKER = re.compile(r'ptt', re.IGNORECASE)
+_SLUG_INVALID = re.compile(r'[^\w\-]')
+_SLUG_UNDERSCORES = re.compile(r'_+')
+
+# UI 和导航相关的关键词（依在頁面中出現的先後排列）
+UI_KEYWORDS = (
+    '下載 App', '所有看板', '即時熱門看板', '創作者排行榜',
+    '最近造訪', '查看全部', '追蹤的看板', '查看所有文章',
+    'Dcard 精選看板', '服務條款', '幫助中心', '品牌識別',
+    '徵才', '商業合作', '隱私政策', '看板首頁', '回到頂部'
+)
+# 主題分類關鍵詞
+TOPIC_KEYWORDS = {
+    '研究生壓力': ['研究所', '碩士', '碩班', '研究', '考研', '研究室'],
+    '心理健康與情緒': ['焦慮', '壓力', '崩潰', '憂鬱', '失眠', '哭', '心理', '情緒'],
+    '人際與孤獨': ['人際', '孤獨', '朋友', '交友', '孤獨', '寂寞', '人緣'],
+    '教育決策（休學/轉學/輔系）': ['休學', '轉學', '輔系', '退學', '放棄'],
+    '校園社群與數位壓力': ['宿舍', '社群', '社團', '校園', '校隊'],
+    '求職與生涯規劃': ['求職', '工作', '職涯', '就業', '面試', '畢業', '找工作']
+}
+# 危機徵候關鍵詞
+CRISIS_KEYWORDS = {
+    'crisis': ['自殺', '自傷', '自我傷害', '死', '消失', '放棄', '無法活', '想死'],
+    'harassment': ['騷擾', '侵害', '暴力', '欺凌', '霸凌'],
+    'medical': ['醫生', '藥物', '治療', '診斷', '症狀']
+}
+
+# 每組關鍵詞合併成一個正規表示式，一次掃描找出所有命中
+_UI_KEYWORDS_RE = re.compile('|'.join(map(re.escape, UI_KEYWORDS)))
+_TOPIC_CATEGORY = {word: category for category, words in TOPIC_KEYWORDS.items() for word in words}
+_TOPIC_RE = re.compile('|'.join(map(re.escape, sorted(_TOPIC_CATEGORY, key=len, reverse=True))))
+# 同一位置開頭的較短關鍵詞也算命中（研究所 → 研究）；重複列出的詞（孤獨）照列出的次數算
+_TOPIC_PREFIXES = {
+    word: [other for words in TOPIC_KEYWORDS.values() for other in words if word.startswith(other)]
+    for word in _TOPIC_CATEGORY
+}
+
+# 模擬對話中固定的助理回覆；各檔案共用同一份，只在序列化時讀取，請勿修改
+_CRISIS_REPLY = {
+    "role": "assistant",
+    "text": "我聽到你的困擾。如果你現在感到非常難受，請聯絡學校心理諮商服務或撥打各地心理健康支持專線。我們可以一起討論如何度過這段艱難時期。"
+}
+_SUPPORT_REPLY = {
+    "role": "assistant",
+    "text": "謝謝你的分享。我理解這對你來說可能很挑戰。能否告訴我更多細節，讓我更好地理解你的情況？"
+}
+_CLOSING_REPLY = {
+    "role": "assistant",
+    "text": "我理解這些挑戰確實會帶來壓力。許多學生都有類似的經歷。你可以考慮和朋友、家人或專業輔導員談論這些感受。"
+}
+
+# HTMLContentExtractor 的區塊狀態旗標
+_F_SCRIPT = 1
+_F_STYLE = 2
+_F_NAV = 4
+_F_ASIDE = 8
+_F_ARTICLE = 16
+_TAG_FLAGS = {
+    'script': _F_SCRIPT, 'style': _F_STYLE, 'nav': _F_NAV,
+    'aside': _F_ASIDE, 'article': _F_ARTICLE, 'main': _F_ARTICLE
+}
+# 這些區塊內的文字不算正文
+_F_SKIP_TEXT = _F_SCRIPT | _F_STYLE | _F_NAV | _F_ASIDE
+
+def join_text_parts(text_parts):
+    """連接文字片段並去除空行"""
+    # 片段在 handle_data 已濾掉 UI 元素，每一行都只是某個片段的一部分，不必再過濾
+    lines = '\n'.join(text_parts).split('\n')
+    return '\n'.join(line for line in lines if line.strip()).strip()
+
 class HTMLContentExtractor(HTMLParser):
     def __init__(self):
         super().__init__()
         self.text_parts = []
-        self.in_script = False
-        self.in_style = False
-        self.in_meta = False
-        self.in_nav = False
-        self.in_aside = False
-        self.in_article = False
+        self.pending_text = []
+        self.flags = 0
         self.article_content = []
         self.depth = 0
-        # UI 和导航相关的关键词
-        self.ui_keywords = [
-            '下載 App', '所有看板', '即時熱門看板', '創作者排行榜',
-            '最近造訪', '查看全部', '追蹤的看板', '查看所有文章',
-            'Dcard 精選看板', '服務條款', '幫助中心', '品牌識別',
-            '徵才', '商業合作', '隱私政策', '看板首頁', '回到頂部'
-        ]
 
     def handle_starttag(self, tag, attrs):
-        if tag in ['script', 'style']:
-            self.__dict__[f'in_{tag}'] = True
-        elif tag == 'nav':
-            self.in_nav = True
-        elif tag == 'aside':
-            self.in_aside = True
-        elif tag == 'article':
-            self.in_article = True
-        elif tag == 'main':
-            self.in_article = True
+        flag = _TAG_FLAGS.get(tag)
+        if flag:
+            self.flags |= flag
 
     def handle_endtag(self, tag):
-        if tag in ['script', 'style']:
-            self.__dict__[f'in_{tag}'] = False
-        elif tag == 'nav':
-            self.in_nav = False
-        elif tag == 'aside':
-            self.in_aside = False
-        elif tag in ['article', 'main']:
-            self.in_article = False
-        elif tag == 'br' and not self.in_nav and not self.in_aside:
-            self.text_parts.append('\n')
-        elif tag == 'p' and not self.in_nav and not self.in_aside:
+        flag = _TAG_FLAGS.get(tag)
+        if flag:
+            self.flags &= ~flag
+        elif tag in ('br', 'p') and not self.flags & (_F_NAV | _F_ASIDE):
             self.text_parts.append('\n')
 
     def handle_data(self, data):
-        if not self.in_script and not self.in_style and not self.in_nav and not self.in_aside:
+        if not self.flags & _F_SKIP_TEXT:
             text = data.strip()
-            if text and not any(ui_kw in text for ui_kw in self.ui_keywords):
+            if text and not _UI_KEYWORDS_RE.search(text):
                 self.text_parts.append(text)
 
-    def get_text(self):
-        # 连接文本并进行清理
-        full_text = '\n'.join(self.text_parts).strip()
+    # lxml 解析器的 target 介面：libxml2 直接推送事件，不建立整棵樹。
+    # libxml2 會在實體和 < 處把一段文字拆成好幾次 data，湊齊後再交給 handle_data
+    def start(self, tag, attrib):
+        self.flush_text()
+        self.handle_starttag(tag, attrib)
+
+    def end(self, tag):
+        self.flush_text()
+        self.handle_endtag(tag)
+
+    def data(self, data):
+        self.pending_text.append(data)
 
-        # 再次过滤UI元素
-        lines = full_text.split('\n')
-        cleaned_lines = []
-        for line in lines:
-            if not any(ui_kw in line for ui_kw in self.ui_keywords) and line.strip():
-                cleaned_lines.append(line)
+    def comment(self, text):
+        self.flush_text()
 
-        return '\n'.join(cleaned_lines).strip()
+    def close(self):
+        super().close()
+        self.flush_text()
+
+    def flush_text(self):
+        if self.pending_text:
+            data = ''.join(self.pending_text)
+            self.pending_text = []
+            self.handle_data(data)
+
+    def get_text(self):
+        return join_text_parts(self.text_parts)
+
+def extract_content_text(html_content):
+    """提取正文文字；開啟 lxml 時由 libxml2 解析，否則用標準庫 HTMLParser"""
+    extractor = HTMLContentExtractor()
+    if etree is None:
+        # 和原本一樣整份餵入且不呼叫 close()，結尾沒收完的片段不算正文
+        extractor.feed(html_content)
+    else:
+        parser = etree.HTMLParser(target=extractor)
+        parser.feed(html_content)
+        parser.close()
+    return extractor.get_text()
 
 def extract_meta(html_content):
     """提取 meta 標籤資訊"""
     meta = {}
-    patterns = {
-        'og:url': r'<meta\s+property=["\']og:url["\']\s+content=["\']([^"\']+)["\']',
-        'og:title': r'<meta\s+property=["\']og:title["\']\s+content=["\']([^"\']+)["\']',
-        'canonical': r'<link\s+rel=["\']canonical["\']\s+href=["\']([^"\']+)["\']'
-    }
-    for key, pattern in patterns.items():
-        match = re.search(pattern, html_content, re.IGNORECASE)
+    for key, pattern in _META_PATTERNS.items():
+        match = pattern.search(html_content)
         if match:
             meta[key] = match.group(1)
     return meta
@@ -97,50 +199,75 @@ def extract_domain(url):
     parsed = urlparse(url)
     return parsed.netloc if parsed.netloc else None
 
+def detect_platform(html_content):
+    """判斷頁面平台：內文任何地方出現 ptt 就算 PTT，否則看是否有 dcard"""
+    match = _PLATFORM_MARKER.search(html_content)
+    if not match:
+        return None
+    # 先遇到 dcard 時，後面仍可能出現 ptt，接著往下找即可，不必重掃
+    if match.group(0).lower() == 'dcard' and not _PTT_MARKER.search(html_content, match.end()):
+        return 'dcard'
+    return 'ptt'
+
 def obscure_personal_info(text):
-    """遮蔽個資：學號、Email、電話"""
+    """遮蔽個資：學號、Email、電話
+
+    >>> obscure_personal_info('請寄信到abc@gmail.com或打0912345678')
+    ('請寄***@gmail.com或打09***678', ['email', 'phone'])
+    >>> obscure_personal_info('信箱abc@gmail.com學號110550001')
+    ('信箱***@gmail.com學號11***0001', ['email', 'phone'])
+    """
     if not text:
         return text, []
 
     changes = []
+    # 先用便宜的檢查排除不可能命中的樣式，省下整段文字的掃描
+    has_digit = _DIGIT.search(text) is not None
 
     # 遮蔽學號（通常 8-10 位數字或混合）
-    student_id_pattern = r'\b\d{8,10}\b'
-    if re.search(student_id_pattern, text):
-        text = re.sub(student_id_pattern, lambda m: m.group(0)[:2] + '***' + m.group(0)[-2:], text)
-        changes.append('student_id')
+    if has_digit:
+        text, count = _STUDENT_ID.subn(lambda m: m.group(0)[:2] + '***' + m.group(0)[-2:], text)
+        if count:
+            changes.append('student_id')
 
     # 遮蔽 Email
-    email_pattern = r'[\w.-]+@[\w.-]+\.\w+'
-    if re.search(email_pattern, text):
-        text = re.sub(email_pattern, lambda m: m.group(0)[:2] + '***@' + m.group(0).split('@')[1], text)
-        changes.append('email')
+    if '@' in text:
+        text, count = _EMAIL.subn(lambda m: m.group(0)[:2] + '***@' + m.group(0).split('@')[1], text)
+        if count:
+            changes.append('email')
 
     # 遮蔽電話（格式多樣）
-    phone_pattern = r'(?:\d{2,4}[-.\s]?)*\d{4}[-.\s]?\d{4}'
-    if re.search(phone_pattern, text):
-        text = re.sub(phone_pattern, lambda m: m.group(0)[:2] + '***' + m.group(0)[-3:], text)
-        changes.append('phone')
+    if has_digit:
+        text, count = _PHONE.subn(lambda m: m.group(0)[:2] + '***' + m.group(0)[-3:], text)
+        if count:
+            changes.append('phone')
 
     return text, changes
 
-def classify_topic(title, content):
-    """根據標題和內容分類主題"""
-    combined = (title + content).lower()
-
-    keywords = {
-        '研究生壓力': ['研究所', '碩士', '碩班', '研究', '考研', '研究室'],
-        '心理健康與情緒': ['焦慮', '壓力', '崩潰', '憂鬱', '失眠', '哭', '心理', '情緒'],
-        '人際與孤獨': ['人際', '孤獨', '朋友', '交友', '孤獨', '寂寞', '人緣'],
-        '教育決策（休學/轉學/輔系）': ['休學', '轉學', '輔系', '退學', '放棄'],
-        '校園社群與數位壓力': ['宿舍', '社群', '社團', '校園', '校隊'],
-        '求職與生涯規劃': ['求職', '工作', '職涯', '就業', '面試', '畢業', '找工作']
-    }
-
-    scores = {}
-    for category, words in keywords.items():
-        score = sum(combined.count(word) for word in words)
-        scores[category] = score
+def _find_topic_keywords(text):
+    """列出文字中出現的每個主題關鍵詞，彼此重疊的也都算"""
+    # findall 不會重疊（考研 會吃掉 研究所 的「研」），所以每次命中後從下一個字重新搜尋
+    found = []
+    match = _TOPIC_RE.search(text)
+    while match:
+        found += _TOPIC_PREFIXES[match.group()]
+        match = _TOPIC_RE.search(text, match.start() + 1)
+    return found
+
+def classify_topic(title_lower, content_lower):
+    """根據標題和內容分類主題（傳入已 casefold 的文字）
+
+    >>> classify_topic('', '考研究所 壓力 焦慮')
+    ('研究生壓力', ['心理健康與情緒'])
+    >>> classify_topic('', '孤獨 焦慮')
+    ('人際與孤獨', ['心理健康與情緒'])
+    >>> classify_topic('找工', '作')
+    ('求職與生涯規劃', [])
+    """
+    # 和原本的 (title + content) 一樣接起來掃描，跨越接縫的關鍵詞也要算到
+    present = set(_find_topic_keywords(title_lower + content_lower))
+    # 只看每個關鍵詞是否出現，不計出現次數；清單裡重複的詞（孤獨）照原本公式算兩次
+    scores = {category: sum(word in present for word in words) for category, words in TOPIC_KEYWORDS.items()}
 
     primary = max(scores, key=scores.get) if scores else '其他'
 
@@ -152,83 +279,49 @@ def classify_topic(title, content):
 def extract_links(html_content):
     """提取 HTML 中的所有超連結"""
     links = []
-    pattern = r'<a\s+(?:[^>]*?\s+)?href=["\']([^"\']+)["\'][^>]*>([^<]*)</a>'
-    matches = re.finditer(pattern, html_content, re.IGNORECASE)
-    for match in matches:
-        href = match.group(1).strip()
-        text = match.group(2).strip()
+    # findall 直接回傳字串 tuple，不必為每個連結建立 Match 物件
+    for href, text in _LINK.findall(html_content):
+        href = href.strip()
+        text = text.strip()
         if href:
             links.append({'href': href, 'text': text if text else None})
     return links
 
-def detect_crisis_flags(content):
-    """檢測危機徵候"""
-    flags = []
-    crisis_keywords = ['自殺', '自傷', '自我傷害', '死', '消失', '放棄', '無法活', '想死']
-    harassment_keywords = ['騷擾', '侵害', '暴力', '欺凌', '霸凌']
-    medical_keywords = ['醫生', '藥物', '治療', '診斷', '症狀']
-
-    content_lower = content.lower()
-
-    if any(kw in content_lower for kw in crisis_keywords):
-        flags.append('crisis')
-    if any(kw in content_lower for kw in harassment_keywords):
-        flags.append('harassment')
-    if any(kw in content_lower for kw in medical_keywords):
-        flags.append('medical')
-
-    return flags
+def detect_crisis_flags(content_lower):
+    """檢測危機徵候（傳入已 casefold 的文字）"""
+    # 危機關鍵詞少，str 的 in 是 C 層的子字串搜尋，比併成一個具名群組的正規表示式快
+    return [flag for flag, words in CRISIS_KEYWORDS.items() if any(word in content_lower for word in words)]
 
 def generate_mock_dialogue(title, content, has_crisis):
     """生成模擬對話"""
-    dialogue = []
-
     if has_crisis:
         # 危機回應
-        dialogue.append({
-            "role": "user",
-            "text": title if title else "我最近遇到了很困擾的問題"
-        })
-        dialogue.append({
-            "role": "assistant",
-            "text": "我聽到你的困擾。如果你現在感到非常難受，請聯絡學校心理諮商服務或撥打各地心理健康支持專線。我們可以一起討論如何度過這段艱難時期。"
-        })
+        opening = {"role": "user", "text": title if title else "我最近遇到了很困擾的問題"}
+        reply = _CRISIS_REPLY
     else:
-        dialogue.append({
-            "role": "user",
-            "text": title if title else "我最近感到很困擾"
-        })
-        dialogue.append({
-            "role": "assistant",
-            "text": "謝謝你的分享。我理解這對你來說可能很挑戰。能否告訴我更多細節，讓我更好地理解你的情況？"
-        })
+        opening = {"role": "user", "text": title if title else "我最近感到很困擾"}
+        reply = _SUPPORT_REPLY
 
     # 添加用戶反應
-    content_excerpt = content[:150] if len(content) > 150 else content
-    dialogue.append({
-        "role": "user",
-        "text": f"嗯，主要是因為{content_excerpt}..."
-    })
-
-    dialogue.append({
-        "role": "assistant",
-        "text": "我理解這些挑戰確實會帶來壓力。許多學生都有類似的經歷。你可以考慮和朋友、家人或專業輔導員談論這些感受。"
-    })
+    follow_up = {"role": "user", "text": f"嗯，主要是因為{content[:150]}..."}
 
-    return dialogue
+    return [opening, reply, follow_up, _CLOSING_REPLY]
 
 def parse_html_file(html_path):
     """解析單個 HTML 檔案"""
-    try:
-        with open(html_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-    except:
+    # 只讀一次檔案，再依序嘗試解碼同一份位元組（latin-1 一定成功）
+    raw = Path(html_path).read_bytes()
+    for encoding in ('utf-8', 'big5', 'latin-1'):
         try:
-            with open(html_path, 'r', encoding='big5') as f:
-                html_content = f.read()
-        except:
-            with open(html_path, 'r', encoding='latin-1') as f:
-                html_content = f.read()
+            html_content = raw.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    # 解碼後就用不到原始位元組，先釋放，解析期間不必同時留著兩份
+    del raw
+    # 和文字模式讀檔一樣統一換行符號
+    if '\r' in html_content:
+        html_content = html_content.replace('\r\n', '\n').replace('\r', '\n')
 
     # 提取基本信息
     meta = extract_meta(html_content)
@@ -236,15 +329,13 @@ def parse_html_file(html_path):
     domain = extract_domain(url)
 
     # 提取文本內容
-    extractor = HTMLContentExtractor()
     try:
-        extractor.feed(html_content)
-        content_text = extractor.get_text()
+        content_text = extract_content_text(html_content)
     except:
         content_text = ""
 
     # 提取標題
-    title_match = re.search(r'<title>([^<]+)</title>', html_content, re.IGNORECASE)
+    title_match = _TITLE.search(html_content)
     title = title_match.group(1) if title_match else None
     if title and ' _ Dcard' in title:
         title = title.replace(' _ Dcard', '').replace(' - 看板', '').strip()
@@ -254,18 +345,23 @@ def parse_html_file(html_path):
     timestamp_iso = None
     board_or_category = None
 
+    platform = detect_platform(html_content)
+
     # PTT 格式
-    if 'ptt' in html_content.lower():
-        board_match = re.search(r'看板\s+([^\s]+)', html_content)
+    if platform == 'ptt':
+        board_match = _PTT_BOARD.search(html_content)
         if board_match:
             board_or_category = board_match.group(1)
-        author_match = re.search(r'作者.*?href[^>]*>([^<]+)</a>', html_content, re.IGNORECASE | re.DOTALL)
-        if author_match:
-            author_display = author_match.group(1).strip()
+        # 先找「作者」再在其後一小段內找連結，避免 .*? 跨整份文件回溯
+        for anchor in _AUTHOR_ANCHOR.finditer(html_content):
+            author_match = _AUTHOR_LINK.search(html_content, anchor.end(), anchor.end() + _AUTHOR_WINDOW)
+            if author_match:
+                author_display = author_match.group(1).strip()
+                break
 
     # Dcard 格式
-    elif 'dcard' in html_content.lower():
-        board_match = re.search(r'板 _ Dcard', html_content)
+    elif platform == 'dcard':
+        board_match = _DCARD_BOARD.search(html_content)
         if board_match:
             if '心情板' in html_content:
                 board_or_category = '心情'
@@ -276,21 +372,21 @@ def parse_html_file(html_path):
 
     # 遮蔽個資
     content_text, obscured = obscure_personal_info(content_text)
+    # 分類與危機檢測共用同一份小寫內容
+    content_lower = content_text.casefold()
 
     # 分類
-    primary_topic, secondary_topics = classify_topic(title or '', content_text)
+    primary_topic, secondary_topics = classify_topic((title or '').casefold(), content_lower)
 
     # 提取連結
     links = extract_links(html_content)
 
     # 檢測危機
-    crisis_flags = detect_crisis_flags(content_text)
+    crisis_flags = detect_crisis_flags(content_lower)
     has_crisis = 'crisis' in crisis_flags
 
     # 生成摘要
-    summary = content_text[:180].replace('\n', ' ').strip()
-    if len(content_text) > 180:
-        summary += '...'
+    summary = content_text[:180].replace('\n', ' ').strip() + ('...' if len(content_text) > 180 else '')
 
     # 生成模擬對話
     dialogue = generate_mock_dialogue(title, content_text, has_crisis)
@@ -324,10 +420,27 @@ def generate_json_filename(source_file, domain):
     # 保留 domain，否則用 'dcard' 或 'ptt'
     domain_short = 'ptt' if domain and 'ptt' in domain else ('dcard' if domain and 'dcard' in domain else 'unknown')
     # 轉換為小寫、去除空格、用底線替代
-    slug = re.sub(r'[^\w\-]', '_', base_name.lower())
-    slug = re.sub(r'_+', '_', slug).strip('_')
+    slug = _SLUG_INVALID.sub('_', base_name.lower())
+    slug = _SLUG_UNDERSCORES.sub('_', slug).strip('_')
     return f"{domain_short}__{slug}__.json"
 
+def dump_json_bytes(result):
+    """把結果序列化成 UTF-8 JSON 位元組；有 orjson 時用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(result, option=orjson.OPT_INDENT_2)
+    return json.dumps(result, ensure_ascii=False, indent=2).encode('utf-8')
+
+def convert_html_file(html_path):
+    """解析單個 HTML 檔案並序列化成 JSON（在子行程中執行）"""
+    try:
+        result = parse_html_file(html_path)
+        json_filename = generate_json_filename(result['source_file'], result['domain'])
+        payload = dump_json_bytes(result)
+    except Exception as e:
+        # 把錯誤帶回主行程，單一檔案失敗不影響其他檔案
+        return None, None, str(e)
+    return json_filename, payload, None
+
 def main():
     input_dir = Path('./input_html')
     output_dir = Path('./output_jsons')
@@ -344,9 +457,12 @@ def main():
     output_dir.mkdir(parents=True)
 
     # 找所有 HTML 檔案（先在根目錄，再在 input_html）
-    html_files = []
-    html_files.extend(Path('.').glob('*.html'))
-    html_files.extend(Path('.').glob('*.htm'))
+    # 單次 scandir 掃描目錄並排序，讓輸出順序固定；和 Path.glob 一樣不排除以 . 開頭的檔案
+    with os.scandir('.') as entries:
+        html_files = sorted(
+            entry.name for entry in entries
+            if entry.name.lower().endswith(('.html', '.htm')) and entry.is_file()
+        )
 
     if not html_files:
         print(f"找不到 HTML 檔案。")
@@ -354,28 +470,38 @@ def main():
 
     print(f"發現 {len(html_files)} 個 HTML 檔案。處理中...")
 
-    for idx, html_file in enumerate(sorted(html_files), 1):
-        try:
-            result = parse_html_file(str(html_file))
-            json_filename = generate_json_filename(result['source_file'], result['domain'])
-            json_path = output_dir / json_filename
-
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
-
-            if idx % 20 == 0:
-                print(f"progress: {idx}/{len(html_files)}")
-        except Exception as e:
-            print(f"error: {html_file.name} - {str(e)}")
-
-    # 壓縮
     zip_path = Path('./nycu_articles_json.zip')
     if zip_path.exists():
         zip_path.unlink()
 
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for json_file in output_dir.glob('*.json'):
-            zipf.write(json_file, arcname=json_file.name)
+    # 各檔案互不相依，分給多個行程平行解析；寫檔與壓縮在主行程依序進行
+    # JSON 文字用 zlib 最低等級壓縮就夠小，速度快很多
+    # 不同 HTML 可能產生同名 JSON：保留第一個，後來的回報錯誤並略過
+    written = {}
+    with ProcessPoolExecutor() as executor, \
+            zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
+        outcomes = executor.map(convert_html_file, html_files, chunksize=8)
+        for idx, (html_file, (json_filename, payload, error)) in enumerate(zip(html_files, outcomes), 1):
+            if error is None and json_filename in written:
+                error = f"duplicate output {json_filename}, keeping {written[json_filename]}; skipped"
+            if error is not None:
+                print(f"error: {html_file} - {error}")
+                continue
+
+            # 寫檔失敗（例如檔名太長）和原本一樣只略過這個檔案
+            try:
+                (output_dir / json_filename).write_bytes(payload)
+                # 字串檔名的 writestr 會給 0600 權限；比照原本 zipf.write 寫入一般檔案的 0644
+                info = zipfile.ZipInfo(json_filename, date_time=time.localtime()[:6])
+                info.external_attr = 0o100644 << 16
+                zipf.writestr(info, payload, compress_type=zipf.compression, compresslevel=zipf.compresslevel)
+            except OSError as e:
+                print(f"error: {html_file} - {e}")
+                continue
+            written[json_filename] = html_file
+
+            if idx % 20 == 0:
+                print(f"progress: {idx}/{len(html_files)}")
 
     print(f"progress: {len(html_files)}/{len(html_files)}")
     print(f"files: ./output_jsons/")